@@ -121,3 +121,12 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Notificaciones de cargas nuevas (SSE en /api/portfolios/.../events/)
+
+PORTFOLIO_EVENTS_FILE = BASE_DIR / 'portfolio_events.json'
+
+PORTFOLIO_EVENTS_POLL_SECONDS = 1.0
+
+PORTFOLIO_EVENTS_KEEPALIVE_SECONDS = 15.0
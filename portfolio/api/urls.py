@@ -1,6 +1,15 @@
 from django.urls import path
 
-from portfolio.api.views import portfolio_snapshot_view
+from portfolio.api.views import (
+    composite_evolution_view,
+    composite_snapshot_view,
+    portfolio_attribution_view,
+    portfolio_events_view,
+    portfolio_evolution_view,
+    portfolio_scenarios_view,
+    portfolio_snapshot_view,
+    portfolios_events_view,
+)
 
 urlpatterns = [
     path(
@@ -8,4 +17,39 @@ urlpatterns = [
         portfolio_snapshot_view,
         name="portfolio-snapshot"
     ),
+    path(
+        "portfolios/<int:portfolio_id>/evolution/",
+        portfolio_evolution_view,
+        name="portfolio-evolution"
+    ),
+    path(
+        "portfolios/<int:portfolio_id>/scenarios/",
+        portfolio_scenarios_view,
+        name="portfolio-scenarios"
+    ),
+    path(
+        "composites/<int:composite_id>/snapshot/",
+        composite_snapshot_view,
+        name="composite-snapshot"
+    ),
+    path(
+        "composites/<int:composite_id>/evolution/",
+        composite_evolution_view,
+        name="composite-evolution"
+    ),
+    path(
+        "portfolios/<int:portfolio_id>/attribution/",
+        portfolio_attribution_view,
+        name="portfolio-attribution"
+    ),
+    path(
+        "portfolios/<int:portfolio_id>/events/",
+        portfolio_events_view,
+        name="portfolio-events"
+    ),
+    path(
+        "portfolios/events/",
+        portfolios_events_view,
+        name="portfolios-events"
+    ),
 ]
\ No newline at end of file
@@ -1,27 +1,55 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from datetime import date
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Any
+from decimal import Decimal
+from typing import Any, AsyncIterator
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import JsonResponse, HttpRequest
-from django.views.decorators.http import require_GET
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpRequest, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
-from portfolio.services import calculate_portfolio_evolution
+from portfolio import selectors
+from portfolio.attribution import calculate_attribution
+from portfolio.exports import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    aiter_in_thread,
+    iter_chunks,
+    iter_evolution_rows,
+    quantize as _q,
+)
+from portfolio.notifications import SnapshotBroadcaster
+from portfolio.scenarios import calculate_scenarios, parse_scenarios
+from portfolio.services import (
+    calculate_composite_evolution,
+    calculate_portfolio_evolution,
+    calculate_portfolio_snapshots,
+)
 
 # Create your views here.
-def _parse_date(value: str | None) -> date:
+def _parse_date(value: Any, name: str = "date") -> date:
     if not value:
-        raise ValueError("Falta query param 'date' (formato esperado: YYYY-MM-DD).")
+        raise ValueError(f"Falta query param '{name}' (formato esperado: YYYY-MM-DD).")
+    if not isinstance(value, str):
+        raise ValueError(f"Formato de '{name}' inválido. Usar YYYY-MM-DD")
     try: 
         return date.fromisoformat(value)
     except ValueError as exc:
-        raise ValueError("Formato de 'date' inválido. Usar YYYY-MM-DD") from exc
-    
-def _q(value: Decimal, decimals: int) -> Decimal: 
-    exp = Decimal("1").scaleb(-decimals)
-    return value.quantize(exp, rounding=ROUND_HALF_UP)
+        raise ValueError(f"Formato de '{name}' inválido. Usar YYYY-MM-DD") from exc
+
+def _parse_format(value: str | None) -> str:
+    fmt = value or "json"
+    if fmt != "json" and fmt not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Formato '{fmt}' no soportado. Usar json, {', '.join(EXPORT_FORMATS)}"
+        )
+    return fmt
 
 def _serialize_snapshot(item: dict[str, Any]) -> dict[str, Any]:
     total_value: Decimal = item["total_value"]
@@ -32,6 +60,53 @@ def _serialize_snapshot(item: dict[str, Any]) -> dict[str, Any]:
         "total_value": str(_q(total_value,2)),
         "weights": {k: str(_q(v, 6)) for k, v in weights.items()},
     }
+def _parse_top(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise ValueError("'top' debe ser un entero") from exc
+
+def _parse_json_body(request: HttpRequest) -> dict[str, Any]:
+    try:
+        body = json.loads(request.body or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Body JSON inválido") from exc
+    if not isinstance(body, dict):
+        raise ValueError("Body JSON debe ser un objeto")
+    return body
+
+def _serialize_scenario_point(item: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "date": item["date"].isoformat(),
+        "baseline": f"{item['baseline']:.2f}",
+        "scenarios": {
+            name: {
+                "total_value": f"{s['total_value']:.2f}",
+                "change": f"{s['change']:.6f}",
+            }
+            for name, s in item["scenarios"].items()
+        },
+    }
+
+def _serialize_attribution(item: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "start_date": item["start_date"].isoformat(),
+        "end_date": item["end_date"].isoformat(),
+        "start_value": f"{item['start_value']:.2f}",
+        "end_value": f"{item['end_value']:.2f}",
+        "total_return": f"{item['total_return']:.6f}",
+        "contributions": [
+            {
+                "ticker": c["ticker"],
+                "value_contribution": f"{c['value_contribution']:.2f}",
+                "return_contribution": f"{c['return_contribution']:.6f}",
+            }
+            for c in item["contributions"]
+        ],
+    }
+
 @require_GET
 def portfolio_snapshot_view(request: HttpRequest, portfolio_id: int):
     try:
@@ -54,4 +129,225 @@ def portfolio_snapshot_view(request: HttpRequest, portfolio_id: int):
         return JsonResponse({"detail": str(exc)}, status=400)
     
     except ObjectDoesNotExist:
-        return JsonResponse({"detail": "Portafolio no encontrado"}, status=404)
\ No newline at end of file
+        return JsonResponse({"detail": "Portafolio no encontrado"}, status=404)
+
+@require_GET
+def portfolio_evolution_view(request: HttpRequest, portfolio_id: int):
+    try:
+        start_date = _parse_date(request.GET.get("start_date"), "start_date")
+        end_date = _parse_date(request.GET.get("end_date"), "end_date")
+        fmt = _parse_format(request.GET.get("format"))
+
+        if fmt == "json":
+            data = calculate_portfolio_evolution(
+                portfolio_id=portfolio_id,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            return JsonResponse(
+                [_serialize_snapshot(item) for item in data],
+                safe=False,
+                status=200,
+            )
+
+        rows = iter_evolution_rows(
+            portfolio_id=portfolio_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        chunks = iter_chunks(EXPORT_FORMATS[fmt](rows))
+        if isinstance(request, ASGIRequest):
+            # bajo ASGI un iterador síncrono se consumiría entero antes de enviar
+            chunks = aiter_in_thread(chunks)
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=CONTENT_TYPES[fmt],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="portfolio_{portfolio_id}_evolution.{fmt}"'
+        )
+        return response
+
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Portafolio no encontrado"}, status=404)
+
+@csrf_exempt
+@require_POST
+def portfolio_scenarios_view(request: HttpRequest, portfolio_id: int):
+    try:
+        body = _parse_json_body(request)
+        start_date = _parse_date(body.get("start_date"), "start_date")
+        end_date = _parse_date(body.get("end_date"), "end_date")
+        scenarios = parse_scenarios(body.get("scenarios"))
+
+        data = calculate_scenarios(
+            portfolio_id=portfolio_id,
+            start_date=start_date,
+            end_date=end_date,
+            scenarios=scenarios,
+        )
+        return JsonResponse(
+            [_serialize_scenario_point(item) for item in data],
+            safe=False,
+            status=200,
+        )
+
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Portafolio no encontrado"}, status=404)
+
+@require_GET
+def composite_snapshot_view(request: HttpRequest, composite_id: int):
+    try:
+        d = _parse_date(request.GET.get("date"))
+
+        data = calculate_composite_evolution(
+            composite_id=composite_id,
+            start_date=d,
+            end_date=d,
+        )
+
+        if not data:
+            return JsonResponse(
+                {"detail": "No hay datos de precios/portafolio para esa fecha."},
+                status = 404,
+            )
+        return JsonResponse(_serialize_snapshot(data[0]), status=200)
+
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Portafolio compuesto no encontrado"}, status=404)
+
+@require_GET
+def composite_evolution_view(request: HttpRequest, composite_id: int):
+    try:
+        start_date = _parse_date(request.GET.get("start_date"), "start_date")
+        end_date = _parse_date(request.GET.get("end_date"), "end_date")
+
+        data = calculate_composite_evolution(
+            composite_id=composite_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        return JsonResponse(
+            [_serialize_snapshot(item) for item in data],
+            safe=False,
+            status=200,
+        )
+
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Portafolio compuesto no encontrado"}, status=404)
+
+@require_GET
+def portfolio_attribution_view(request: HttpRequest, portfolio_id: int):
+    try:
+        start_date = _parse_date(request.GET.get("start_date"), "start_date")
+        end_date = _parse_date(request.GET.get("end_date"), "end_date")
+
+        data = calculate_attribution(
+            portfolio_id=portfolio_id,
+            start_date=start_date,
+            end_date=end_date,
+            granularity=request.GET.get("granularity") or "period",
+            top=_parse_top(request.GET.get("top")),
+        )
+
+        if not data:
+            return JsonResponse(
+                {"detail": "Se necesitan al menos dos fechas con precios en el rango."},
+                status = 404,
+            )
+        return JsonResponse(
+            [_serialize_attribution(item) for item in data],
+            safe=False,
+            status=200,
+        )
+
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"detail": "Portafolio no encontrado"}, status=404)
+
+def _parse_ids(value: str | None) -> list[int]:
+    if not value:
+        raise ValueError("Falta query param 'ids' (ej: ids=1,2).")
+    try:
+        ids = sorted({int(v) for v in value.split(",") if v.strip()})
+    except ValueError as exc:
+        raise ValueError("'ids' debe ser una lista de enteros separados por coma") from exc
+    if not ids:
+        raise ValueError("'ids' no puede estar vacío")
+    return ids
+
+def _render_snapshot_events(portfolio_id: int, dates: list[date]) -> list[str]:
+    data = calculate_portfolio_snapshots(portfolio_id=portfolio_id, dates=dates)
+    return [
+        "event: snapshot\n"
+        f"id: {portfolio_id}:{item['date'].isoformat()}\n"
+        f"data: {json.dumps({'portfolio_id': portfolio_id, **_serialize_snapshot(item)})}\n\n"
+        for item in data
+    ]
+
+_broadcaster = SnapshotBroadcaster(render=_render_snapshot_events)
+
+async def _event_stream(portfolio_ids: list[int]) -> AsyncIterator[str]:
+    queue = _broadcaster.subscribe(portfolio_ids)
+    try:
+        yield ": conectado\n\n"
+        while True:
+            try:
+                messages = await asyncio.wait_for(
+                    queue.get(), timeout=settings.PORTFOLIO_EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            for message in messages:
+                yield message
+    finally:
+        _broadcaster.unsubscribe(queue, portfolio_ids)
+
+async def _events_response(portfolio_ids: list[int]):
+    found = await sync_to_async(selectors.existing_portfolio_ids)(portfolio_ids=portfolio_ids)
+    missing = sorted(set(portfolio_ids) - found)
+    if missing:
+        return JsonResponse({"detail": f"Portafolio no encontrado: {missing}"}, status=404)
+
+    response = StreamingHttpResponse(_event_stream(portfolio_ids), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+def _asgi_required() -> JsonResponse:
+    # bajo WSGI el stream async se consumiría entero antes de responder
+    return JsonResponse(
+        {"detail": "Los eventos requieren un servidor ASGI (ej: uvicorn config.asgi:application)"},
+        status=501,
+    )
+
+@require_GET
+async def portfolio_events_view(request: HttpRequest, portfolio_id: int):
+    if not isinstance(request, ASGIRequest):
+        return _asgi_required()
+    return await _events_response([portfolio_id])
+
+@require_GET
+async def portfolios_events_view(request: HttpRequest):
+    if not isinstance(request, ASGIRequest):
+        return _asgi_required()
+    try:
+        portfolio_ids = _parse_ids(request.GET.get("ids"))
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    return await _events_response(portfolio_ids)
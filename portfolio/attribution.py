@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+from portfolio.services import load_price_matrix
+
+GRANULARITIES = ("period", "daily")
+
+
+def calculate_attribution(
+    *,
+    portfolio_id: int,
+    start_date: date,
+    end_date: date,
+    granularity: str = "period",
+    top: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Contribución de cada activo al cambio de valor del portafolio.
+
+    - period: un solo tramo entre la primera y la última fecha con precios
+      del rango.
+    - daily: un tramo por cada par de fechas consecutivas.
+
+    La contribución al retorno de un activo es su cambio de valor sobre el
+    valor total al inicio del tramo, por lo que suman el retorno total.
+    `top` deja los N activos de mayor contribución absoluta por tramo.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity debe ser una de {GRANULARITIES}")
+    if top is not None and top < 1:
+        raise ValueError("top debe ser >= 1")
+
+    matrix = load_price_matrix(
+        portfolio_id=portfolio_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    n_dates = len(matrix.dates)
+    if n_dates < 2:
+        return []
+
+    if granularity == "period":
+        starts, ends = np.array([0]), np.array([n_dates - 1])
+    else:
+        starts, ends = np.arange(n_dates - 1), np.arange(1, n_dates)
+
+    values = matrix.values()
+    totals = values.sum(axis=1)
+
+    delta = values[ends] - values[starts]
+    base = totals[starts]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        contrib_return = np.where(base[:, None] > 0, delta / base[:, None], 0.0)
+        total_return = np.where(base > 0, totals[ends] / base - 1, 0.0)
+
+    order = np.argsort(-np.abs(delta), axis=1, kind="stable")
+    if top is not None:
+        order = order[:, :top]
+
+    tickers = np.array(matrix.tickers, dtype=object)
+    ranked_tickers = tickers[order]
+    ranked_delta = np.take_along_axis(delta, order, axis=1)
+    ranked_return = np.take_along_axis(contrib_return, order, axis=1)
+
+    return [
+        {
+            "start_date": matrix.dates[starts[i]],
+            "end_date": matrix.dates[ends[i]],
+            "start_value": float(base[i]),
+            "end_value": float(totals[ends[i]]),
+            "total_return": float(total_return[i]),
+            "contributions": [
+                {
+                    "ticker": ticker,
+                    "value_contribution": float(v),
+                    "return_contribution": float(r),
+                }
+                for ticker, v, r in zip(
+                    ranked_tickers[i], ranked_delta[i], ranked_return[i]
+                )
+            ],
+        }
+        for i in range(len(starts))
+    ]
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import csv
+import json
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+
+from portfolio.services import iter_portfolio_evolution
+
+EVOLUTION_COLUMNS = ("date", "portfolio", "ticker", "value", "weight")
+
+# por debajo de los 64 KiB en que el handler ASGI de Django parte cada body
+CHUNK_SIZE = 60 * 1024
+
+
+def quantize(value: Decimal, decimals: int) -> Decimal:
+    exp = Decimal("1").scaleb(-decimals)
+    return value.quantize(exp, rounding=ROUND_HALF_UP)
+
+
+def iter_evolution_rows(
+    *,
+    portfolio_id: int,
+    start_date: date,
+    end_date: date,
+) -> Iterator[dict[str, str]]:
+    """
+    Evolución en formato largo: una fila por (fecha, activo), generada a
+    medida que el motor de valorización avanza fecha a fecha.
+    """
+    snapshots = iter_portfolio_evolution(
+        portfolio_id=portfolio_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return _iter_rows(portfolio_id, snapshots)
+
+
+def _iter_rows(
+    portfolio_id: int,
+    snapshots: Iterable[dict],
+) -> Iterator[dict[str, str]]:
+    portfolio = str(portfolio_id)
+    for item in snapshots:
+        d = item["date"].isoformat()
+        weights = item["weights"]
+        for ticker, value in item["values"].items():
+            yield {
+                "date": d,
+                "portfolio": portfolio,
+                "ticker": ticker,
+                "value": str(quantize(value, 2)),
+                "weight": str(quantize(weights[ticker], 6)),
+            }
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(rows: Iterable[dict[str, str]]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EVOLUTION_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[c] for c in EVOLUTION_COLUMNS])
+
+
+def iter_ndjson(rows: Iterable[dict[str, str]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS: dict[str, Callable[[Iterable[dict[str, str]]], Iterator[str]]] = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def iter_chunks(lines: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Agrupa líneas en bloques de ~`size` caracteres para no enviar una por fila."""
+    buffer: list[str] = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+async def aiter_in_thread(iterator: Iterable[str], batch_size: int = 1) -> AsyncIterator[str]:
+    """
+    Consume un iterador síncrono (que usa el ORM) de a `batch_size` elementos
+    por llamada a sync_to_async, para que ASGI no lo convierta en lista entera.
+    """
+    it = iter(iterator)
+
+    def next_batch() -> list[str]:
+        return list(islice(it, batch_size))
+
+    while True:
+        batch = await sync_to_async(next_batch)()
+        if not batch:
+            return
+        for item in batch:
+            yield item
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import http.client
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+from urllib.parse import urlsplit
+
+import numpy as np
+
+REQUEST_KINDS = ("hot", "random_date", "random_portfolio")
+
+
+@dataclass(frozen=True)
+class Sample:
+    kind: str
+    status: int
+    latency: float
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """
+    Convierte "hot=0.6,random_date=0.3,random_portfolio=0.1" en pesos
+    normalizados por tipo de request.
+    """
+    mix: dict[str, float] = {}
+    for part in value.split(","):
+        kind, sep, weight = part.partition("=")
+        kind = kind.strip()
+        if not sep or kind not in REQUEST_KINDS:
+            raise ValueError(
+                f"Mix inválido '{part}'. Usar <tipo>=<peso> con tipo en {REQUEST_KINDS}"
+            )
+        if kind in mix:
+            raise ValueError(f"Tipo '{kind}' repetido en el mix")
+        try:
+            mix[kind] = float(weight)
+        except ValueError as exc:
+            raise ValueError(f"Peso inválido en '{part}'") from exc
+
+    total = sum(mix.values())
+    if total <= 0 or any(w < 0 for w in mix.values()):
+        raise ValueError("Los pesos del mix deben ser >= 0 y sumar más que 0")
+    return {kind: w / total for kind, w in mix.items()}
+
+
+def build_paths(
+    *,
+    portfolio_ids: list[int],
+    dates: list[date],
+    mix: dict[str, float],
+    total: int,
+    hot_dates: int,
+    seed: int = 0,
+) -> list[tuple[str, str]]:
+    """
+    Arma de antemano la lista de (tipo, path) a pedir, para que generar
+    requests no compita por CPU con la medición.
+
+    - hot: primer portafolio, una de las últimas `hot_dates` fechas.
+    - random_date: primer portafolio, fecha al azar.
+    - random_portfolio: portafolio al azar, fecha al azar.
+    """
+    if not portfolio_ids or not dates:
+        raise ValueError("No hay portafolios o fechas para generar requests")
+
+    rng = random.Random(seed)
+    hot = dates[-hot_dates:]
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=total)
+
+    paths: list[tuple[str, str]] = []
+    for kind in kinds:
+        if kind == "hot":
+            pid, d = portfolio_ids[0], rng.choice(hot)
+        elif kind == "random_date":
+            pid, d = portfolio_ids[0], rng.choice(dates)
+        else:
+            pid, d = rng.choice(portfolio_ids), rng.choice(dates)
+        paths.append((kind, f"/api/portfolios/{pid}/snapshot/?date={d.isoformat()}"))
+    return paths
+
+
+def run_load(
+    *,
+    base_url: str,
+    paths: list[tuple[str, str]],
+    concurrency: int,
+    timeout: float = 30.0,
+) -> tuple[list[Sample], float]:
+    """
+    Ejecuta los requests con `concurrency` hilos. Cada hilo reutiliza una
+    conexión keep-alive, así la latencia medida no incluye abrir TCP en cada
+    request. Devuelve muestras y duración.
+    """
+    url = urlsplit(base_url)
+    if url.scheme not in ("http", "https") or not url.hostname:
+        raise ValueError(f"base_url inválida: '{base_url}'")
+    connection_cls = (
+        http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    )
+    prefix = url.path.rstrip("/")
+
+    samples: list[Sample] = []
+    connections: list[http.client.HTTPConnection] = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def get_connection() -> http.client.HTTPConnection:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = connection_cls(url.hostname, url.port, timeout=timeout)
+            local.conn = conn
+            with lock:
+                connections.append(conn)
+        return conn
+
+    def fetch(item: tuple[str, str]) -> None:
+        kind, path = item
+        t0 = time.perf_counter()
+        conn = get_connection()
+        try:
+            conn.request("GET", prefix + path)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+            if resp.will_close:
+                conn.close()
+        except (http.client.HTTPException, OSError):
+            # la próxima request del hilo reconecta
+            conn.close()
+            status = 0
+        latency = time.perf_counter() - t0
+        with lock:
+            samples.append(Sample(kind=kind, status=status, latency=latency))
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, paths))
+    finally:
+        for conn in connections:
+            conn.close()
+    elapsed = time.perf_counter() - started
+
+    return samples, elapsed
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, Any]:
+    def stats(group: list[Sample]) -> dict[str, Any]:
+        latencies_ms = np.array([s.latency for s in group]) * 1000
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        return {
+            "requests": len(group),
+            # cualquier respuesta no 2xx (incluye 404 y fallas de conexión = 0)
+            "errors": sum(1 for s in group if not 200 <= s.status < 300),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(latencies_ms.max()),
+        }
+
+    if not samples:
+        return {"requests": 0, "elapsed_s": elapsed, "throughput_rps": 0.0}
+
+    statuses: dict[int, int] = {}
+    for s in samples:
+        statuses[s.status] = statuses.get(s.status, 0) + 1
+
+    summary = stats(samples)
+    summary["elapsed_s"] = elapsed
+    summary["throughput_rps"] = len(samples) / elapsed if elapsed else 0.0
+    summary["statuses"] = dict(sorted(statuses.items()))
+    summary["by_kind"] = {
+        kind: stats([s for s in samples if s.kind == kind])
+        for kind in REQUEST_KINDS
+        if any(s.kind == kind for s in samples)
+    }
+    return summary
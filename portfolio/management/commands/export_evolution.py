@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.exports import EXPORT_FORMATS, iter_chunks, iter_evolution_rows
+
+class Command(BaseCommand):
+    help = "Exporta la evolución de un portafolio en formato largo (CSV o NDJSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--portfolio-id", type=int, required=True)
+        parser.add_argument("--start-date", type=date.fromisoformat, required=True)
+        parser.add_argument("--end-date", type=date.fromisoformat, required=True)
+        parser.add_argument(
+            "--format",
+            choices=sorted(EXPORT_FORMATS),
+            default="csv",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default="-",
+            help="Archivo de salida ('-' para stdout).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rows = iter_evolution_rows(
+                portfolio_id=options["portfolio_id"],
+                start_date=options["start_date"],
+                end_date=options["end_date"],
+            )
+            chunks = iter_chunks(EXPORT_FORMATS[options["format"]](rows))
+
+            if options["output"] == "-":
+                for chunk in chunks:
+                    self.stdout.write(chunk, ending="")
+            else:
+                with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                    fh.writelines(chunks)
+        except ValueError as exc:
+            raise CommandError(f"Error de validación: {exc}") from exc
+        except OSError as exc:
+            raise CommandError(f"No se pudo escribir la salida: {exc}") from exc
@@ -0,0 +1,99 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import selectors
+from portfolio.services import SYNTHETIC_PREFIX
+from portfolio.loadtest import build_paths, parse_mix, run_load, summarize
+
+class Command(BaseCommand):
+    help = (
+        "Genera carga HTTP contra el endpoint de snapshot de un servidor local "
+        "y reporta throughput y latencias p50/p95/p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", type=str, default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument(
+            "--mix",
+            type=str,
+            default="hot=0.6,random_date=0.3,random_portfolio=0.1",
+        )
+        parser.add_argument("--hot-dates", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--all-portfolios",
+            action="store_true",
+            help="Incluye portafolios no sintéticos en el mix.",
+        )
+        parser.add_argument("--json", action="store_true", help="Imprime el resumen en JSON.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["requests"] < 1 or options["hot_dates"] < 1:
+            raise CommandError("--concurrency, --requests y --hot-dates deben ser >= 1")
+
+        try:
+            mix = parse_mix(options["mix"])
+            portfolio_ids = selectors.list_portfolio_ids_with_positions(
+                name_prefix="" if options["all_portfolios"] else SYNTHETIC_PREFIX,
+            )
+            paths = build_paths(
+                portfolio_ids=portfolio_ids,
+                dates=selectors.list_price_dates_portfolios(portfolio_ids=portfolio_ids),
+                mix=mix,
+                total=options["warmup"] + options["requests"],
+                hot_dates=options["hot_dates"],
+                seed=options["seed"],
+            )
+        except ValueError as exc:
+            raise CommandError(f"Error de validación: {exc}") from exc
+
+        warmup, measured = paths[: options["warmup"]], paths[options["warmup"]:]
+        try:
+            if warmup:
+                run_load(
+                    base_url=options["base_url"],
+                    paths=warmup,
+                    concurrency=options["concurrency"],
+                )
+
+            samples, elapsed = run_load(
+                base_url=options["base_url"],
+                paths=measured,
+                concurrency=options["concurrency"],
+            )
+        except ValueError as exc:
+            raise CommandError(f"Error de validación: {exc}") from exc
+        summary = summarize(samples, elapsed)
+        summary["concurrency"] = options["concurrency"]
+        summary["mix"] = mix
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write(
+            f"{summary['requests']} requests en {elapsed:.2f}s "
+            f"({summary['throughput_rps']:.1f} req/s, concurrencia {options['concurrency']})"
+        )
+        self.stdout.write(f"status: {summary['statuses']}  errores: {summary['errors']}")
+        self.stdout.write(self._format_row("total", summary))
+        for kind, stats in summary["by_kind"].items():
+            self.stdout.write(self._format_row(kind, stats))
+
+        if summary["errors"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{summary['errors']} requests no 2xx: las latencias no son representativas"
+                )
+            )
+
+    def _format_row(self, label, stats):
+        return (
+            f"{label:<17} n={stats['requests']:<6} "
+            f"p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+            f"p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+        )
@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.services import SYNTHETIC_PREFIX, seed_synthetic_data
+
+class Command(BaseCommand):
+    help = "Genera portafolios y precios sintéticos para pruebas de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--portfolios", type=int, default=10)
+        parser.add_argument("--assets", type=int, default=50)
+        parser.add_argument("--days", type=int, default=750)
+        parser.add_argument("--start-date", type=date.fromisoformat, default=date(2020, 1, 1))
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.NOTICE(
+                f"generando {options['portfolios']} portafolios, "
+                f"{options['assets']} activos y {options['days']} días"
+            )
+        )
+
+        try:
+            seed_synthetic_data(
+                n_portfolios=options["portfolios"],
+                n_assets=options["assets"],
+                n_days=options["days"],
+                start_date=options["start_date"],
+                seed=options["seed"],
+            )
+        except ValueError as exc:
+            raise CommandError(f"Error de validación: {exc}") from exc
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Datos sintéticos cargados (prefijo '{SYNTHETIC_PREFIX}')")
+        )
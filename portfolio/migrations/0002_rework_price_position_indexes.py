@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='assetprice',
+            name='idx_asset_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='portfolioposition',
+            name='idx_portfolio_asset',
+        ),
+        migrations.AlterField(
+            model_name='assetprice',
+            name='asset',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='portfolio.asset'),
+        ),
+        migrations.AlterField(
+            model_name='assetprice',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='assetprice',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='portfolioposition',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='portfolioposition',
+            name='portfolio',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='portfolio.portfolio'),
+        ),
+        migrations.AddIndex(
+            model_name='assetprice',
+            index=models.Index(fields=['asset', 'date', 'price'], name='idx_price_asset_date_cover'),
+        ),
+    ]
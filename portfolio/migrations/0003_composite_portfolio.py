@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:14
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0002_rework_price_position_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompositePortfolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'composite_portfolio',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CompositeMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shares', models.DecimalField(decimal_places=10, max_digits=30, validators=[django.core.validators.MinValueValidator(0)])),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='composite_memberships', to='portfolio.portfolio')),
+                ('composite', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='members', to='portfolio.compositeportfolio')),
+            ],
+            options={
+                'db_table': 'composite_member',
+                'ordering': ['composite', 'portfolio'],
+                'constraints': [models.UniqueConstraint(fields=('composite', 'portfolio'), name='composite_portfolio_unique')],
+            },
+        ),
+    ]
@@ -37,10 +37,15 @@ class Asset(BaseModel):
 
 
 class PortfolioPosition(BaseModel):
+    # tabla caliente: no se consulta por fecha de creación
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # cubierto por portfolio_asset_unique (portfolio, asset)
     portfolio = models.ForeignKey(
         Portfolio,
         on_delete=models.CASCADE,
-        related_name="positions"
+        related_name="positions",
+        db_index=False,
     )
 
     asset = models.ForeignKey(
@@ -64,19 +69,21 @@ class PortfolioPosition(BaseModel):
                 name="portfolio_asset_unique",
             )
         ]
-        indexes = [
-            models.Index(fields=["portfolio","asset"], name="idx_portfolio_asset"),
-        ]
     def __str__(self) -> str:
         return f"{self.portfolio} - {self.asset} ({self.quantity})"
     
 class AssetPrice(BaseModel):
+    # tabla caliente: no se consulta por fecha de creación
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # cubierto por price_asset_date (asset, date)
     asset = models.ForeignKey(
         Asset,
         on_delete=models.CASCADE,
         related_name="prices",
+        db_index=False,
     )
-    date = models.DateField(db_index=True)
+    date = models.DateField()
     price = models.DecimalField(max_digits=20, decimal_places=6, validators=[MinValueValidator(0)])
 
     class Meta: 
@@ -89,8 +96,54 @@ class AssetPrice(BaseModel):
             )
         ]
         indexes = [
-            models.Index(fields=["asset","date"], name="idx_asset_date"),
+            # covering para el scan por rango de fechas del motor de valorización
+            models.Index(fields=["asset","date","price"], name="idx_price_asset_date_cover"),
         ]
     def __str__(self) -> str :
         return f"{self.asset} @ {self.date} = {self.price}"
-    
\ No newline at end of file
+
+
+class CompositePortfolio(BaseModel):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        db_table = "composite_portfolio"
+        ordering = ['name']
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class CompositeMember(BaseModel):
+    # cubierto por composite_portfolio_unique (composite, portfolio)
+    composite = models.ForeignKey(
+        CompositePortfolio,
+        on_delete=models.CASCADE,
+        related_name="members",
+        db_index=False,
+    )
+
+    portfolio = models.ForeignKey(
+        Portfolio,
+        on_delete=models.PROTECT,
+        related_name="composite_memberships",
+    )
+
+    # unidades del portafolio miembro: sus cantidades se multiplican por shares
+    shares = models.DecimalField(
+        max_digits=30,
+        decimal_places=10,
+        validators=[MinValueValidator(0)]
+    )
+
+    class Meta:
+        db_table = 'composite_member'
+        ordering = ['composite','portfolio']
+        constraints = [
+            models.UniqueConstraint(
+                fields=["composite", "portfolio"],
+                name="composite_portfolio_unique",
+            )
+        ]
+    def __str__(self) -> str:
+        return f"{self.composite} - {self.portfolio} ({self.shares})"
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# cargas recientes que se conservan en el archivo de notificaciones
+LOAD_LOG_SIZE = 20
+
+
+def _events_path() -> Path:
+    return Path(settings.PORTFOLIO_EVENTS_FILE)
+
+
+def notify_data_loaded(dates: Iterable[date]) -> None:
+    """
+    Publica que hay fechas nuevas con datos. Se agrega una entrada al log de
+    cargas recientes en un archivo local (reemplazo atómico) para que los
+    procesos del servidor la vean aunque haya varias cargas entre dos lecturas.
+    Las cargas concurrentes se serializan con un lock sobre un archivo vecino;
+    los lectores no lo necesitan porque el reemplazo es atómico.
+    """
+    path = _events_path()
+    with open(path.with_name(f"{path.name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        entries = read_load_log()
+        last_version = entries[-1]["version"] if entries else 0
+        entries.append(
+            {
+                "version": max(time.time_ns(), last_version + 1),
+                "dates": sorted(d.isoformat() for d in dates),
+            }
+        )
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entries[-LOAD_LOG_SIZE:]), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def read_load_log() -> list[dict[str, Any]]:
+    try:
+        entries = json.loads(_events_path().read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return entries if isinstance(entries, list) else []
+
+
+def _latest_version() -> int:
+    entries = read_load_log()
+    return entries[-1]["version"] if entries else 0
+
+
+def _events_mtime() -> int | None:
+    try:
+        return _events_path().stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class SnapshotBroadcaster:
+    """
+    Fan-out en proceso de snapshots nuevos hacia suscriptores SSE.
+
+    Una sola tarea por proceso vigila el archivo de notificaciones mientras
+    haya suscriptores. Ante cargas nuevas, `render(portfolio_id, dates)` se
+    ejecuta una vez por portafolio suscrito con la unión de sus fechas y el
+    resultado (mensajes SSE ya serializados) se entrega a todas sus colas.
+    """
+
+    def __init__(
+        self,
+        *,
+        render: Callable[[int, list[date]], list[str]],
+        queue_size: int = 100,
+    ) -> None:
+        self._render = render
+        self._queue_size = queue_size
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._task: asyncio.Task | None = None
+        self._last_mtime: int | None = None
+        self._last_version = 0
+
+    def subscribe(self, portfolio_ids: Iterable[int]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        for portfolio_id in portfolio_ids:
+            self._subscribers.setdefault(portfolio_id, set()).add(queue)
+
+        if self._task is None or self._task.done():
+            # solo se empujan cargas posteriores al inicio de la vigilancia
+            self._last_mtime = _events_mtime()
+            self._last_version = _latest_version()
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, portfolio_ids: Iterable[int]) -> None:
+        for portfolio_id in portfolio_ids:
+            queues = self._subscribers.get(portfolio_id)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[portfolio_id]
+
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(settings.PORTFOLIO_EVENTS_POLL_SECONDS)
+            try:
+                await self._check()
+            except Exception:
+                # la tarea es única por proceso: un error no debe dejar a los
+                # suscriptores recibiendo solo keep-alives
+                logger.exception("Error procesando notificaciones de carga")
+
+    async def _check(self) -> None:
+        mtime = _events_mtime()
+        if mtime is None or mtime == self._last_mtime:
+            return
+        self._last_mtime = mtime
+
+        new_entries = [e for e in read_load_log() if e["version"] > self._last_version]
+        if not new_entries:
+            return
+        self._last_version = new_entries[-1]["version"]
+
+        dates = sorted({date.fromisoformat(d) for e in new_entries for d in e["dates"]})
+        if dates:
+            await self._publish(dates)
+
+    async def _publish(self, dates: list[date]) -> None:
+        for portfolio_id in list(self._subscribers):
+            try:
+                messages = await sync_to_async(self._render)(portfolio_id, dates)
+            except ValueError:
+                # portafolio sin posiciones: no hay snapshots que enviar
+                continue
+            except Exception:
+                logger.exception("Error calculando snapshots del portafolio %s", portfolio_id)
+                continue
+            if not messages:
+                continue
+            for queue in self._subscribers.get(portfolio_id, ()):
+                if queue.full():
+                    # suscriptor lento: se descarta lo más antiguo
+                    queue.get_nowait()
+                queue.put_nowait(messages)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+from portfolio.services import PriceMatrix, load_price_matrix
+
+MAX_SCENARIOS = 100
+MAX_MULTIPLIER = 100.0
+# escenarios evaluados juntos: acota el tensor (escenarios x fechas x activos)
+SCENARIO_BATCH = 16
+
+
+def parse_scenarios(raw: Any) -> list[dict[str, Any]]:
+    """
+    Valida la lista de escenarios del request:
+
+        [{"name": "crash", "shocks": [
+            {"tickers": ["EEUU"], "multiplier": 0.8,
+             "from_date": "2022-06-01", "to_date": "2022-12-31"}
+        ]}]
+
+    Un shock sin `tickers` aplica a todos los activos; sin fechas aplica a
+    todo el rango. Los shocks de un mismo escenario se multiplican.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("'scenarios' debe ser una lista no vacía")
+    if len(raw) > MAX_SCENARIOS:
+        raise ValueError(f"Máximo {MAX_SCENARIOS} escenarios por request")
+
+    scenarios: list[dict[str, Any]] = []
+    names: set[str] = set()
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"Escenario {i} debe ser un objeto")
+        name = item.get("name", f"scenario_{i + 1}")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"'name' del escenario {i} debe ser un string no vacío")
+        if name in names:
+            raise ValueError(f"Escenario '{name}' repetido")
+        names.add(name)
+
+        shocks = item.get("shocks")
+        if not isinstance(shocks, list) or not shocks:
+            raise ValueError(f"Escenario '{name}' debe tener una lista 'shocks' no vacía")
+
+        scenarios.append(
+            {"name": name, "shocks": [_parse_shock(name, s) for s in shocks]}
+        )
+    return scenarios
+
+
+def _parse_shock(name: str, raw: Any) -> dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise ValueError(f"Shock inválido en escenario '{name}'")
+
+    multiplier = raw.get("multiplier")
+    if isinstance(multiplier, bool) or not isinstance(multiplier, (int, float)):
+        raise ValueError(f"Shock en '{name}' requiere 'multiplier' numérico")
+    multiplier = float(multiplier)
+    if not 0 <= multiplier <= MAX_MULTIPLIER:
+        raise ValueError(f"'multiplier' en '{name}' debe estar entre 0 y {MAX_MULTIPLIER:g}")
+
+    tickers = raw.get("tickers")
+    if tickers is not None and (
+        not isinstance(tickers, list) or not all(isinstance(t, str) for t in tickers)
+    ):
+        raise ValueError(f"'tickers' en '{name}' debe ser una lista de strings")
+    if tickers == []:
+        raise ValueError(f"'tickers' en '{name}' no puede ser vacía (omitir para todos)")
+
+    try:
+        from_date = date.fromisoformat(raw["from_date"]) if raw.get("from_date") else None
+        to_date = date.fromisoformat(raw["to_date"]) if raw.get("to_date") else None
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Fechas inválidas en '{name}'. Usar YYYY-MM-DD") from exc
+    if from_date and to_date and from_date > to_date:
+        raise ValueError(f"'from_date' no puede ser posterior a 'to_date' en '{name}'")
+
+    return {
+        "tickers": tickers,
+        "multiplier": multiplier,
+        "from_date": from_date,
+        "to_date": to_date,
+    }
+
+
+def compile_shocks(
+    matrix: PriceMatrix,
+    scenarios: list[dict[str, Any]],
+) -> list[list[tuple[np.ndarray, np.ndarray, float]]]:
+    """
+    Traduce cada shock a (máscara de fechas, columnas, multiplicador) sobre
+    la matriz. Valida los tickers de todos los escenarios antes de calcular.
+    """
+    col_by_ticker = {t: j for j, t in enumerate(matrix.tickers)}
+    dates = np.array(matrix.dates, dtype="datetime64[D]")
+    all_cols = np.arange(len(matrix.tickers))
+
+    compiled = []
+    for scenario in scenarios:
+        shocks = []
+        for shock in scenario["shocks"]:
+            if shock["tickers"] is None:
+                cols = all_cols
+            else:
+                unknown = [t for t in shock["tickers"] if t not in col_by_ticker]
+                if unknown:
+                    raise ValueError(
+                        f"Tickers {unknown} no pertenecen al portafolio "
+                        f"(escenario '{scenario['name']}')"
+                    )
+                cols = np.array([col_by_ticker[t] for t in shock["tickers"]], dtype=int)
+
+            date_mask = np.ones(len(dates), dtype=bool)
+            if shock["from_date"] is not None:
+                date_mask &= dates >= np.datetime64(shock["from_date"])
+            if shock["to_date"] is not None:
+                date_mask &= dates <= np.datetime64(shock["to_date"])
+
+            shocks.append((date_mask, cols, shock["multiplier"]))
+        compiled.append(shocks)
+    return compiled
+
+
+def build_multipliers(
+    shape: tuple[int, int],
+    compiled: list[list[tuple[np.ndarray, np.ndarray, float]]],
+) -> np.ndarray:
+    """Tensor (escenarios x fechas x activos) de multiplicadores de precio."""
+    multipliers = np.ones((len(compiled), *shape))
+    for k, shocks in enumerate(compiled):
+        for date_mask, cols, multiplier in shocks:
+            multipliers[k][np.ix_(date_mask, cols)] *= multiplier
+    return multipliers
+
+
+def calculate_scenarios(
+    *,
+    portfolio_id: int,
+    start_date: date,
+    end_date: date,
+    scenarios: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """
+    Evolución base y bajo cada escenario sobre la matriz de precios, cargada
+    una sola vez. Los escenarios se evalúan en lotes de `SCENARIO_BATCH` con
+    un solo einsum por lote, así la memoria no crece con la cantidad de
+    escenarios. No escribe en la base de datos.
+    """
+    matrix = load_price_matrix(
+        portfolio_id=portfolio_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+    compiled = compile_shocks(matrix, scenarios)
+    values = matrix.values()
+    baseline = values.sum(axis=1)
+    shocked = np.empty((len(scenarios), len(matrix.dates)))
+    for start in range(0, len(compiled), SCENARIO_BATCH):
+        batch = compiled[start:start + SCENARIO_BATCH]
+        shocked[start:start + len(batch)] = np.einsum(
+            "sda,da->sd", build_multipliers(values.shape, batch), values
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(baseline > 0, shocked / baseline - 1, 0.0)
+
+    names = [s["name"] for s in scenarios]
+    return [
+        {
+            "date": d,
+            "baseline": float(baseline[i]),
+            "scenarios": {
+                name: {
+                    "total_value": float(shocked[k, i]),
+                    "change": float(change[k, i]),
+                }
+                for k, name in enumerate(names)
+            },
+        }
+        for i, d in enumerate(matrix.dates)
+    ]
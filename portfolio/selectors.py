@@ -3,9 +3,14 @@ from __future__ import annotations
 from datetime import date
 from typing import Iterable
 
-from django.db.models import QuerySet
+from django.db.models import Exists, F, OuterRef, QuerySet
 
-from portfolio.models import Asset, AssetPrice, Portfolio, PortfolioPosition
+from portfolio.models import (
+    AssetPrice,
+    CompositePortfolio,
+    Portfolio,
+    PortfolioPosition,
+)
 
 def get_portfolio(*, portfolio_id: int) -> Portfolio:
     return Portfolio.objects.get(id=portfolio_id)
@@ -17,35 +22,83 @@ def get_portfolio_positions(*, portfolio_id: int) -> QuerySet[PortfolioPosition]
         .order_by("asset__ticker")
     )
 
-def get_prices_assets(
+def get_price_rows_assets(
         *,
-        assets: Iterable[Asset],
-        start_date:date,
+        asset_ids: Iterable[int],
+        start_date: date,
         end_date: date,
- ) -> QuerySet[AssetPrice]:
+ ) -> QuerySet:
+    """
+    (date, asset_id, price) ordenado por fecha. Solo lee columnas de
+    idx_price_asset_date_cover, sin tocar la tabla ni hacer join con asset.
+    """
     return (
         AssetPrice.objects.filter(
-            asset__in=list(assets),
+            asset_id__in=list(asset_ids),
             date__range=(start_date, end_date),
         )
-        .select_related("asset")
-        .order_by("date", "asset__ticker")
+        .values_list("date", "asset_id", "price")
+        .order_by("date")
+    )
+
+def get_price_rows_assets_dates(
+        *,
+        asset_ids: Iterable[int],
+        dates: Iterable[date],
+ ) -> QuerySet:
+    """
+    Igual que get_price_rows_assets pero solo para las fechas indicadas:
+    búsquedas puntuales por price_asset_date (asset, date).
+    """
+    return (
+        AssetPrice.objects.filter(
+            asset_id__in=list(asset_ids),
+            date__in=list(dates),
+        )
+        .values_list("date", "asset_id", "price")
+        .order_by("date")
+    )
+
+def list_portfolio_ids_with_positions(*, name_prefix: str = "") -> list[int]:
+    qs = (
+        Portfolio.objects.filter(
+            Exists(PortfolioPosition.objects.filter(portfolio_id=OuterRef("pk"))),
+            name__startswith=name_prefix,
+        )
+        .values_list("id", flat=True)
+        .order_by("id")
+    )
+    return list(qs)
+
+def existing_portfolio_ids(*, portfolio_ids: Iterable[int]) -> set[int]:
+    return set(
+        Portfolio.objects.filter(id__in=list(portfolio_ids)).values_list("id", flat=True)
     )
 
-def available_price_dates_assets(
-    *,
-    assets: Iterable[Asset],
-    start_date: date,
-    end_date: date,
-) -> list[date]:
+def list_price_dates_portfolios(*, portfolio_ids: Iterable[int]) -> list[date]:
     qs = (
         AssetPrice.objects.filter(
-            asset__in=list(assets),
-            date__range=(start_date, end_date),
+            asset__positions__portfolio_id__in=list(portfolio_ids),
         )
         .values_list("date", flat=True)
         .distinct()
         .order_by("date")
     )
+    return list(qs)
+
+def get_composite(*, composite_id: int) -> CompositePortfolio:
+    return CompositePortfolio.objects.get(id=composite_id)
 
-    return list(qs)
\ No newline at end of file
+def get_composite_positions(*, composite_id: int) -> QuerySet[PortfolioPosition]:
+    """
+    Posiciones de todos los portafolios miembro en una sola consulta,
+    anotadas con las `shares` del miembro en el compuesto.
+    """
+    return (
+        PortfolioPosition.objects.filter(
+            portfolio__composite_memberships__composite_id=composite_id,
+        )
+        .annotate(shares=F("portfolio__composite_memberships__shares"))
+        .select_related("asset")
+        .order_by("asset__ticker")
+    )
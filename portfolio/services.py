@@ -2,17 +2,28 @@ from __future__ import annotations
 
 from pathlib import Path
 from decimal import Decimal
-from datetime import date
-from typing import Any
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, NamedTuple
 
+import numpy as np
 import pandas as pd
 
 from django.db import transaction
 
-from portfolio.models import Portfolio, Asset, PortfolioPosition, AssetPrice
+from portfolio.models import (
+    Asset,
+    AssetPrice,
+    CompositeMember,
+    Portfolio,
+    PortfolioPosition,
+)
 from portfolio import selectors
+from portfolio.notifications import notify_data_loaded
 
 INITIAL_VALUE = Decimal("1000000000")
+SYNTHETIC_PREFIX = "SYN-"
 
 
 def load_portfolio_data(excel_path: Path) -> None:
@@ -61,7 +72,7 @@ def load_portfolio_data(excel_path: Path) -> None:
 
         # load acciones y precios
 
-        assets_map = _process_assets_prices(prices_df)
+        assets_map, new_dates = _process_assets_prices(prices_df)
 
         # load posiciones
         _process_weights_positions(
@@ -72,6 +83,10 @@ def load_portfolio_data(excel_path: Path) -> None:
             t0=t0,
         )
 
+        # avisar a los suscriptores SSE solo si la carga se confirma
+        if new_dates:
+            transaction.on_commit(lambda: notify_data_loaded(new_dates), robust=True)
+
 
 def _validate_weights_columns(weights_df: pd.DataFrame) -> None:
     required_columns = {"fecha", "ticker", "portfolio_1", "portfolio_2"}
@@ -112,8 +127,12 @@ def _validate_weights_sum(
             f"{p2_sum}"
         )
 
-def _process_assets_prices(prices_df: pd.DataFrame) -> dict[str, Asset]:
+def _process_assets_prices(
+    prices_df: pd.DataFrame,
+) -> tuple[dict[str, Asset], set[date]]:
+    """Devuelve los activos por ticker y las fechas con al menos un precio nuevo."""
     assets_map: dict[str, Asset] = {}
+    new_dates: set[date] = set()
 
     date_column = prices_df.columns[0]
     ticker_columns = [str(c).strip() for c in prices_df.columns[1:]]
@@ -133,13 +152,15 @@ def _process_assets_prices(prices_df: pd.DataFrame) -> dict[str, Asset]:
             if pd.isna(price_value):
                 continue
 
-            AssetPrice.objects.update_or_create(
+            _, created = AssetPrice.objects.update_or_create(
                 asset=assets_map[ticker],
                 date=current_date,
                 defaults={"price": Decimal(str(price_value))},
             )
+            if created:
+                new_dates.add(current_date)
 
-    return assets_map
+    return assets_map, new_dates
 
 
 def _process_weights_positions(
@@ -211,37 +232,125 @@ def calculate_portfolio_evolution(
     start_date: date,
     end_date: date,
 ) -> list[dict[str, Any]]:
+    return list(
+        iter_portfolio_evolution(
+            portfolio_id=portfolio_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    )
+
+
+def iter_portfolio_evolution(
+    *,
+    portfolio_id: int,
+    start_date: date,
+    end_date: date,
+) -> Iterator[dict[str, Any]]:
+    """
+    Igual que calculate_portfolio_evolution pero entrega un snapshot por fecha
+    a medida que recorre los precios, sin cargar todo el rango en memoria.
+    """
     if start_date > end_date:
         raise ValueError("start_date no puede ser mayor que end_date")
 
+    qty_by_ticker, ticker_by_asset_id = _portfolio_quantities(portfolio_id)
+    price_rows = selectors.get_price_rows_assets(
+        asset_ids=ticker_by_asset_id.keys(),
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+    return _iter_evolution(qty_by_ticker, ticker_by_asset_id, price_rows.iterator())
+
+
+def calculate_portfolio_snapshots(
+    *,
+    portfolio_id: int,
+    dates: Iterable[date],
+) -> list[dict[str, Any]]:
+    """
+    Snapshots solo de las fechas indicadas, que pueden no ser contiguas
+    (p. ej. las fechas nuevas de una carga), sin recorrer el rango entre ellas.
+    """
+    qty_by_ticker, ticker_by_asset_id = _portfolio_quantities(portfolio_id)
+    price_rows = selectors.get_price_rows_assets_dates(
+        asset_ids=ticker_by_asset_id.keys(),
+        dates=dates,
+    )
+    return list(_iter_evolution(qty_by_ticker, ticker_by_asset_id, price_rows))
+
+
+def _portfolio_quantities(portfolio_id: int) -> tuple[dict[str, Decimal], dict[int, str]]:
     positions_qs = selectors.get_portfolio_positions(portfolio_id=portfolio_id)
     if not positions_qs.exists():
         raise ValueError(f"Portfolio {portfolio_id} no tiene posiciones")
 
-    assets = [p.asset for p in positions_qs]
+    qty_by_ticker = _build_ticker_quantity(positions_qs)
+    ticker_by_asset_id = {p.asset_id: p.asset.ticker for p in positions_qs}
+    return qty_by_ticker, ticker_by_asset_id
+
 
-    dates = selectors.available_price_dates_assets(
-        assets=assets,
-        start_date=start_date,
-        end_date=end_date,
+def calculate_composite_evolution(
+    *,
+    composite_id: int,
+    start_date: date,
+    end_date: date,
+) -> list[dict[str, Any]]:
+    return list(
+        iter_composite_evolution(
+            composite_id=composite_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
     )
-    if not dates:
-        return []
 
-    prices_qs = selectors.get_prices_assets(
-        assets=assets,
+
+def iter_composite_evolution(
+    *,
+    composite_id: int,
+    start_date: date,
+    end_date: date,
+) -> Iterator[dict[str, Any]]:
+    """
+    Evolución de un portafolio compuesto. Las cantidades de los miembros se
+    suman (ponderadas por shares) en un único vector por activo y se valoriza
+    una sola vez, así los weights ya quedan en look-through.
+    """
+    if start_date > end_date:
+        raise ValueError("start_date no puede ser mayor que end_date")
+
+    selectors.get_composite(composite_id=composite_id)
+
+    qty_by_ticker: dict[str, Decimal] = {}
+    ticker_by_asset_id: dict[int, str] = {}
+    for p in selectors.get_composite_positions(composite_id=composite_id):
+        ticker = p.asset.ticker
+        qty_by_ticker[ticker] = qty_by_ticker.get(ticker, Decimal("0")) + p.shares * p.quantity
+        ticker_by_asset_id[p.asset_id] = ticker
+
+    if not qty_by_ticker:
+        raise ValueError(f"Portafolio compuesto {composite_id} no tiene posiciones")
+
+    price_rows = selectors.get_price_rows_assets(
+        asset_ids=ticker_by_asset_id.keys(),
         start_date=start_date,
         end_date=end_date,
     )
 
+    return _iter_evolution(qty_by_ticker, ticker_by_asset_id, price_rows.iterator())
 
-    qty_by_ticker = _build_ticker_quantity(positions_qs)
-    prices_by_date_ticker = _build_prices_by_date_ticker(prices_qs)
-
-    result: list[dict[str, Any]] = []
 
-    for d in dates:
-        ticker_price_map = prices_by_date_ticker.get(d, {})
+def _iter_evolution(
+    qty_by_ticker: dict[str, Decimal],
+    ticker_by_asset_id: dict[int, str],
+    price_rows: Iterable[tuple[date, int, Decimal]],
+) -> Iterator[dict[str, Any]]:
+    # las filas vienen ordenadas por fecha, se agrupan de a un día
+    for d, day_rows in groupby(price_rows, key=itemgetter(0)):
+        ticker_price_map = {
+            ticker_by_asset_id[asset_id]: price for _, asset_id, price in day_rows
+        }
         asset_values: dict[str, Decimal] = {}
         total_value = Decimal("0")
 
@@ -261,14 +370,87 @@ def calculate_portfolio_evolution(
                 ticker: (value / total_value) for ticker, value in asset_values.items()
             }
 
-        result.append(
-            {
-                "date": d,
-                "total_value": total_value,
-                "weights": weights,
-            }
-        )
-    return result
+        yield {
+            "date": d,
+            "total_value": total_value,
+            "weights": weights,
+            "values": asset_values,
+        }
+
+class PriceMatrix(NamedTuple):
+    """
+    Precios de los activos de un portafolio como matriz (fechas x activos),
+    con NaN donde no hay precio, y el vector de cantidades alineado a tickers.
+    """
+
+    dates: list[date]
+    tickers: list[str]
+    prices: np.ndarray
+    quantities: np.ndarray
+
+    def values(self) -> np.ndarray:
+        """Valor por fecha y activo; sin precio vale 0, igual que el motor Decimal."""
+        return np.nan_to_num(self.prices, nan=0.0) * self.quantities
+
+
+def load_price_matrix(
+    *,
+    portfolio_id: int,
+    start_date: date,
+    end_date: date,
+) -> PriceMatrix:
+    if start_date > end_date:
+        raise ValueError("start_date no puede ser mayor que end_date")
+
+    positions_qs = selectors.get_portfolio_positions(portfolio_id=portfolio_id)
+    qty_by_asset_id = {p.asset_id: p.quantity for p in positions_qs}
+    if not qty_by_asset_id:
+        raise ValueError(f"Portfolio {portfolio_id} no tiene posiciones")
+
+    ticker_by_asset_id = {p.asset_id: p.asset.ticker for p in positions_qs}
+    return _build_price_matrix(
+        qty_by_asset_id=qty_by_asset_id,
+        ticker_by_asset_id=ticker_by_asset_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+def _build_price_matrix(
+    *,
+    qty_by_asset_id: dict[int, Decimal],
+    ticker_by_asset_id: dict[int, str],
+    start_date: date,
+    end_date: date,
+) -> PriceMatrix:
+    asset_ids = list(qty_by_asset_id)
+    col_by_asset_id = {asset_id: j for j, asset_id in enumerate(asset_ids)}
+
+    price_rows = selectors.get_price_rows_assets(
+        asset_ids=asset_ids,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    dates: list[date] = []
+    rows: list[int] = []
+    cols: list[int] = []
+    values: list[float] = []
+    for d, asset_id, price in price_rows:
+        if not dates or dates[-1] != d:
+            dates.append(d)
+        rows.append(len(dates) - 1)
+        cols.append(col_by_asset_id[asset_id])
+        values.append(float(price))
+
+    prices = np.full((len(dates), len(asset_ids)), np.nan)
+    prices[rows, cols] = values
+
+    return PriceMatrix(
+        dates=dates,
+        tickers=[ticker_by_asset_id[asset_id] for asset_id in asset_ids],
+        prices=prices,
+        quantities=np.array([float(qty_by_asset_id[a]) for a in asset_ids]),
+    )
 
 def _build_ticker_quantity(positions_qs) -> dict[str,Decimal]:
     qty_by_ticker: dict[str,Decimal] = {}
@@ -276,8 +458,71 @@ def _build_ticker_quantity(positions_qs) -> dict[str,Decimal]:
         qty_by_ticker[p.asset.ticker] = p.quantity
     return qty_by_ticker
 
-def _build_prices_by_date_ticker(prices_qs) -> dict[date,dict[str,Decimal]]:
-    prices_by: dict[date, dict[str, Decimal]] = {}
-    for ap in prices_qs:
-        prices_by.setdefault(ap.date, {})[ap.asset.ticker] = ap.price
-    return prices_by
+
+# Datos sintéticos
+
+
+def seed_synthetic_data(
+    *,
+    n_portfolios: int,
+    n_assets: int,
+    n_days: int,
+    start_date: date,
+    seed: int = 0,
+) -> None:
+    """
+    Genera portafolios, activos y precios aleatorios (random walk) para
+    pruebas de carga. Reemplaza los datos sintéticos de una corrida anterior.
+    """
+    if n_portfolios < 1 or n_assets < 1 or n_days < 1:
+        raise ValueError("n_portfolios, n_assets y n_days deben ser >= 1")
+
+    rng = np.random.default_rng(seed)
+
+    with transaction.atomic():
+        # CompositeMember.portfolio es PROTECT: se sacan de los compuestos primero
+        CompositeMember.objects.filter(
+            portfolio__name__startswith=SYNTHETIC_PREFIX,
+        ).delete()
+        Portfolio.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
+        Asset.objects.filter(ticker__startswith=SYNTHETIC_PREFIX).delete()
+
+        assets = Asset.objects.bulk_create(
+            [Asset(ticker=f"{SYNTHETIC_PREFIX}{i:04d}") for i in range(n_assets)]
+        )
+
+        dates = [start_date + timedelta(days=i) for i in range(n_days)]
+        returns = rng.normal(0.0002, 0.01, size=(n_days, n_assets))
+        returns[0] = 0
+        prices = 100 * np.exp(np.cumsum(returns, axis=0))
+
+        AssetPrice.objects.bulk_create(
+            (
+                AssetPrice(
+                    asset=asset,
+                    date=d,
+                    price=Decimal(f"{prices[i, j]:.6f}"),
+                )
+                for i, d in enumerate(dates)
+                for j, asset in enumerate(assets)
+            ),
+            batch_size=5000,
+        )
+
+        for k in range(n_portfolios):
+            portfolio = Portfolio.objects.create(
+                name=f"{SYNTHETIC_PREFIX}Portfolio {k + 1}",
+                initial_value=INITIAL_VALUE,
+            )
+            weights = rng.dirichlet(np.ones(n_assets))
+            PortfolioPosition.objects.bulk_create(
+                PortfolioPosition(
+                    portfolio=portfolio,
+                    asset=asset,
+                    quantity=(
+                        Decimal(f"{weights[j]:.10f}") * INITIAL_VALUE
+                        / Decimal(f"{prices[0, j]:.6f}")
+                    ),
+                )
+                for j, asset in enumerate(assets)
+            )
@@ -1,3 +1,668 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import re
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import pandas as pd
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from portfolio import selectors
+from portfolio.attribution import GRANULARITIES, calculate_attribution
+from portfolio.exports import iter_chunks
+from portfolio.loadtest import Sample, build_paths, parse_mix, summarize
+from portfolio.models import (
+    Asset,
+    AssetPrice,
+    CompositeMember,
+    CompositePortfolio,
+    Portfolio,
+    PortfolioPosition,
+)
+from portfolio.notifications import SnapshotBroadcaster, notify_data_loaded
+from portfolio.scenarios import SCENARIO_BATCH, calculate_scenarios, parse_scenarios
+from portfolio.services import (
+    SYNTHETIC_PREFIX,
+    _process_assets_prices,
+    calculate_composite_evolution,
+    calculate_portfolio_evolution,
+    calculate_portfolio_snapshots,
+    seed_synthetic_data,
+)
+
+HOT_TABLES = ("asset_price", "portfolio_position")
+
+
+class QueryPlanTests(TestCase):
+    """
+    Captura EXPLAIN QUERY PLAN de las consultas de selectors y falla si
+    alguna vuelve a recorrer completa una de las tablas grandes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.start = date(2022, 1, 3)
+        cls.end = cls.start + timedelta(days=9)
+
+        cls.portfolio = Portfolio.objects.create(name="P", initial_value=Decimal("1000"))
+        other = Portfolio.objects.create(name="Q", initial_value=Decimal("1000"))
+        cls.assets = Asset.objects.bulk_create(Asset(ticker=f"T{i}") for i in range(5))
+
+        AssetPrice.objects.bulk_create(
+            AssetPrice(asset=a, date=cls.start + timedelta(days=d), price=Decimal("10"))
+            for a in cls.assets
+            for d in range(30)
+        )
+        for p in (cls.portfolio, other):
+            PortfolioPosition.objects.bulk_create(
+                PortfolioPosition(portfolio=p, asset=a, quantity=Decimal("1"))
+                for a in cls.assets
+            )
+
+        cls.composite = CompositePortfolio.objects.create(name="C")
+        CompositeMember.objects.create(
+            composite=cls.composite, portfolio=cls.portfolio, shares=Decimal("2")
+        )
+
+    def assertNoTableScan(self, fn, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            result = fn(**kwargs)
+            if not isinstance(result, list):
+                list(result)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = "\n".join(row[-1] for row in cursor.fetchall())
+                for table in HOT_TABLES:
+                    self.assertIsNone(
+                        re.search(rf"\bSCAN {table}\b", plan),
+                        f"table scan sobre {table}:\n{query['sql']}\n{plan}",
+                    )
+                plans.append(plan)
+        self.assertTrue(plans)
+        return "\n".join(plans)
+
+    def test_portfolio_positions(self):
+        self.assertNoTableScan(
+            selectors.get_portfolio_positions,
+            portfolio_id=self.portfolio.id,
+        )
+
+    def test_price_rows_use_covering_index(self):
+        plan = self.assertNoTableScan(
+            selectors.get_price_rows_assets,
+            asset_ids=[a.id for a in self.assets],
+            start_date=self.start,
+            end_date=self.end,
+        )
+        self.assertIn("COVERING INDEX idx_price_asset_date_cover", plan)
+
+    def test_price_rows_dates(self):
+        self.assertNoTableScan(
+            selectors.get_price_rows_assets_dates,
+            asset_ids=[a.id for a in self.assets],
+            dates=[self.start, self.end],
+        )
+
+    def test_price_dates_portfolios(self):
+        self.assertNoTableScan(
+            selectors.list_price_dates_portfolios,
+            portfolio_ids=[self.portfolio.id],
+        )
+
+    def test_portfolio_ids_with_positions(self):
+        self.assertNoTableScan(
+            selectors.list_portfolio_ids_with_positions,
+            name_prefix="P",
+        )
+
+    def test_existing_portfolio_ids(self):
+        self.assertNoTableScan(
+            selectors.existing_portfolio_ids,
+            portfolio_ids=[self.portfolio.id],
+        )
+
+    def test_composite_positions(self):
+        self.assertNoTableScan(
+            selectors.get_composite_positions,
+            composite_id=self.composite.id,
+        )
+
+
+class SchemaIndexTests(TestCase):
+    def test_no_redundant_indexes(self):
+        """Ningún índice debe ser prefijo de otro índice o constraint de la tabla."""
+        for table in HOT_TABLES:
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, table)
+
+            indexes = {
+                name: tuple(c["columns"])
+                for name, c in constraints.items()
+                if (c["index"] or c["unique"]) and not c["primary_key"]
+            }
+            for name, columns in indexes.items():
+                for other, other_columns in indexes.items():
+                    if name == other or constraints[name]["unique"]:
+                        continue
+                    self.assertFalse(
+                        other_columns[: len(columns)] == columns,
+                        f"{table}.{name} {columns} es redundante con {other} {other_columns}",
+                    )
+
+    def test_hot_tables_without_created_at_index(self):
+        for table in HOT_TABLES:
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, table)
+            indexed = [c["columns"] for c in constraints.values() if c["index"]]
+            self.assertNotIn(["created_at"], indexed, table)
+
+
+class EvolutionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portfolio = Portfolio.objects.create(name="P", initial_value=Decimal("1000"))
+        a = Asset.objects.create(ticker="A")
+        b = Asset.objects.create(ticker="B")
+        AssetPrice.objects.bulk_create(
+            [
+                AssetPrice(asset=a, date=date(2022, 1, 3), price=Decimal("1.005")),
+                AssetPrice(asset=b, date=date(2022, 1, 3), price=Decimal("1.4975")),
+                AssetPrice(asset=a, date=date(2022, 1, 4), price=Decimal("2")),
+            ]
+        )
+        PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=a, quantity=Decimal("1"))
+        PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=b, quantity=Decimal("2"))
+        cls.url = (
+            f"/api/portfolios/{cls.portfolio.id}/evolution/"
+            "?start_date=2022-01-03&end_date=2022-01-04"
+        )
+
+    def test_csv_rows(self):
+        response = self.client.get(self.url + "&format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+
+        body = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(body)))
+        pid = str(self.portfolio.id)
+        self.assertEqual(
+            rows,
+            [
+                ["date", "portfolio", "ticker", "value", "weight"],
+                ["2022-01-03", pid, "A", "1.01", "0.251250"],
+                ["2022-01-03", pid, "B", "3.00", "0.748750"],
+                ["2022-01-04", pid, "A", "2.00", "1.000000"],
+            ],
+        )
+
+    def test_ndjson_rows(self):
+        response = self.client.get(self.url + "&format=ndjson")
+        self.assertEqual(response.status_code, 200)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(
+            json.loads(lines[1]),
+            {
+                "date": "2022-01-03",
+                "portfolio": str(self.portfolio.id),
+                "ticker": "B",
+                "value": "3.00",
+                "weight": "0.748750",
+            },
+        )
+
+    def test_invalid_format(self):
+        response = self.client.get(self.url + "&format=xml")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_streams_async_iterator(self):
+        response = await self.async_client.get(self.url + "&format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 4)
+
+
+class ChunkTests(SimpleTestCase):
+    def test_iter_chunks_groups_lines(self):
+        lines = ["x" * 10] * 25
+        chunks = list(iter_chunks(lines, size=100))
+        self.assertEqual([len(c) for c in chunks], [100, 100, 50])
+        self.assertEqual("".join(chunks), "".join(lines))
+
+
+class LoadtestSummaryTests(SimpleTestCase):
+    def test_non_2xx_counted_as_errors(self):
+        samples = [
+            Sample(kind="hot", status=200, latency=0.01),
+            Sample(kind="hot", status=404, latency=0.01),
+            Sample(kind="random_date", status=500, latency=0.01),
+            Sample(kind="random_date", status=0, latency=0.01),
+        ]
+        summary = summarize(samples, elapsed=1.0)
+        self.assertEqual(summary["errors"], 3)
+        self.assertEqual(summary["by_kind"]["hot"]["errors"], 1)
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("hot=3,random_date=1"), {"hot": 0.75, "random_date": 0.25})
+        for value in (
+            "cold=1",
+            "hot",
+            "hot=x",
+            "hot=-1,random_date=2",
+            "hot=0,random_date=0",
+            "hot=1,hot=2",
+        ):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_mix(value)
+
+    def test_build_paths(self):
+        dates = [date(2022, 1, 1) + timedelta(days=i) for i in range(30)]
+        paths = build_paths(
+            portfolio_ids=[1, 2, 3],
+            dates=dates,
+            mix={"hot": 0.75, "random_portfolio": 0.25},
+            total=2000,
+            hot_dates=3,
+        )
+        self.assertEqual(len(paths), 2000)
+
+        kinds = [kind for kind, _ in paths]
+        self.assertEqual(set(kinds), {"hot", "random_portfolio"})
+        self.assertAlmostEqual(kinds.count("hot") / len(kinds), 0.75, delta=0.05)
+
+        hot = {d.isoformat() for d in dates[-3:]}
+        for kind, path in paths:
+            if kind == "hot":
+                self.assertTrue(path.startswith("/api/portfolios/1/snapshot/"))
+                self.assertIn(path.rsplit("=", 1)[1], hot)
+
+
+class ScenarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portfolio = Portfolio.objects.create(name="P", initial_value=Decimal("1000"))
+        a = Asset.objects.create(ticker="A")
+        b = Asset.objects.create(ticker="B")
+        cls.dates = [date(2022, 1, 3), date(2022, 1, 4), date(2022, 1, 5)]
+        AssetPrice.objects.bulk_create(
+            AssetPrice(asset=asset, date=d, price=price)
+            for asset, price in ((a, Decimal("10")), (b, Decimal("20")))
+            for d in cls.dates
+        )
+        PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=a, quantity=Decimal("1"))
+        PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=b, quantity=Decimal("1"))
+        cls.url = f"/api/portfolios/{cls.portfolio.id}/scenarios/"
+
+    def _post(self, body):
+        return self.client.post(self.url, json.dumps(body), content_type="application/json")
+
+    def test_shock_math(self):
+        scenarios = parse_scenarios(
+            [
+                {"name": "a_from_d2", "shocks": [
+                    {"tickers": ["A"], "multiplier": 0.5, "from_date": "2022-01-04"},
+                ]},
+                {"name": "all_to_d1", "shocks": [
+                    {"multiplier": 2, "to_date": "2022-01-03"},
+                ]},
+                {"name": "stacked", "shocks": [
+                    {"tickers": ["A"], "multiplier": 0.5},
+                    {"tickers": ["A"], "multiplier": 3, "from_date": "2022-01-05", "to_date": "2022-01-05"},
+                    {"tickers": ["B"], "multiplier": 0, "from_date": "2022-01-04", "to_date": "2022-01-04"},
+                ]},
+            ]
+        )
+        data = calculate_scenarios(
+            portfolio_id=self.portfolio.id,
+            start_date=self.dates[0],
+            end_date=self.dates[-1],
+            scenarios=scenarios,
+        )
+
+        self.assertEqual([item["baseline"] for item in data], [30.0, 30.0, 30.0])
+        expected = {
+            "a_from_d2": [30.0, 25.0, 25.0],
+            "all_to_d1": [60.0, 30.0, 30.0],
+            "stacked": [25.0, 5.0, 35.0],
+        }
+        for name, totals in expected.items():
+            self.assertEqual(
+                [item["scenarios"][name]["total_value"] for item in data], totals, name
+            )
+        self.assertAlmostEqual(data[1]["scenarios"]["stacked"]["change"], 5 / 30 - 1)
+
+    def test_more_scenarios_than_batch(self):
+        count = SCENARIO_BATCH * 2 + 1
+        scenarios = parse_scenarios(
+            [
+                {"name": f"s{k}", "shocks": [{"tickers": ["A"], "multiplier": k}]}
+                for k in range(count)
+            ]
+        )
+        data = calculate_scenarios(
+            portfolio_id=self.portfolio.id,
+            start_date=self.dates[0],
+            end_date=self.dates[0],
+            scenarios=scenarios,
+        )
+        self.assertEqual(
+            [data[0]["scenarios"][f"s{k}"]["total_value"] for k in range(count)],
+            [10.0 * k + 20.0 for k in range(count)],
+        )
+
+    def test_endpoint(self):
+        response = self._post(
+            {
+                "start_date": "2022-01-03",
+                "end_date": "2022-01-05",
+                "scenarios": [{"name": "s", "shocks": [{"multiplier": 1.1}]}],
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()[0]["scenarios"]["s"],
+            {"total_value": "33.00", "change": "0.100000"},
+        )
+
+    def test_invalid_input(self):
+        valid = {"name": "s", "shocks": [{"multiplier": 0.8}]}
+        cases = [
+            {"start_date": 20220103, "scenarios": [valid]},
+            {"scenarios": [{"name": "s", "shocks": [{"multiplier": True}]}]},
+            {"scenarios": [{"name": "s", "shocks": [{"multiplier": 1e308}]}]},
+            {"scenarios": [{"name": "s", "shocks": [{"multiplier": -1}]}]},
+            {"scenarios": [{"name": ["x"], "shocks": [{"multiplier": 0.8}]}]},
+            {"scenarios": [{"name": "s", "shocks": [{"tickers": ["Z"], "multiplier": 0.8}]}]},
+            {"scenarios": [{"name": "s", "shocks": [{"tickers": [], "multiplier": 0.8}]}]},
+            {"scenarios": [{"name": "s", "shocks": [
+                {"multiplier": 0.8, "from_date": "2022-01-05", "to_date": "2022-01-03"},
+            ]}]},
+        ]
+        for case in cases:
+            body = {"start_date": "2022-01-03", "end_date": "2022-01-05", **case}
+            with self.subTest(body=body):
+                self.assertEqual(self._post(body).status_code, 400)
+
+
+class CompositeEvolutionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.d = date(2022, 1, 3)
+        a = Asset.objects.create(ticker="A")
+        b = Asset.objects.create(ticker="B")
+        AssetPrice.objects.create(asset=a, date=cls.d, price=Decimal("10"))
+        AssetPrice.objects.create(asset=b, date=cls.d, price=Decimal("5"))
+
+        cls.p1 = Portfolio.objects.create(name="P1", initial_value=Decimal("1000"))
+        cls.p2 = Portfolio.objects.create(name="P2", initial_value=Decimal("1000"))
+        PortfolioPosition.objects.create(portfolio=cls.p1, asset=a, quantity=Decimal("1"))
+        PortfolioPosition.objects.create(portfolio=cls.p1, asset=b, quantity=Decimal("2"))
+        PortfolioPosition.objects.create(portfolio=cls.p2, asset=a, quantity=Decimal("3"))
+
+        cls.composite = CompositePortfolio.objects.create(name="C")
+        CompositeMember.objects.create(composite=cls.composite, portfolio=cls.p1, shares=Decimal("2"))
+        CompositeMember.objects.create(composite=cls.composite, portfolio=cls.p2, shares=Decimal("0.5"))
+
+    def _total(self, **kwargs):
+        fn = calculate_composite_evolution if "composite_id" in kwargs else calculate_portfolio_evolution
+        return fn(start_date=self.d, end_date=self.d, **kwargs)[0]
+
+    def test_total_is_sum_of_weighted_members(self):
+        composite = self._total(composite_id=self.composite.id)
+        p1 = self._total(portfolio_id=self.p1.id)
+        p2 = self._total(portfolio_id=self.p2.id)
+
+        self.assertEqual(
+            composite["total_value"],
+            2 * p1["total_value"] + Decimal("0.5") * p2["total_value"],
+        )
+        self.assertEqual(composite["total_value"], Decimal("55"))
+
+    def test_look_through_weights_from_merged_quantities(self):
+        composite = self._total(composite_id=self.composite.id)
+        # A: 2*1 + 0.5*3 = 3.5 unidades * 10; B: 2*2 = 4 unidades * 5
+        self.assertEqual(composite["values"], {"A": Decimal("35"), "B": Decimal("20")})
+        self.assertEqual(
+            composite["weights"],
+            {"A": Decimal("35") / Decimal("55"), "B": Decimal("20") / Decimal("55")},
+        )
+
+    def test_snapshot_endpoint(self):
+        response = self.client.get(
+            f"/api/composites/{self.composite.id}/snapshot/?date=2022-01-03"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_value"], "55.00")
+
+    def test_reseed_with_synthetic_member(self):
+        seed_synthetic_data(n_portfolios=1, n_assets=2, n_days=2, start_date=self.d)
+        CompositeMember.objects.create(
+            composite=self.composite,
+            portfolio=Portfolio.objects.get(name=f"{SYNTHETIC_PREFIX}Portfolio 1"),
+            shares=Decimal("1"),
+        )
+
+        seed_synthetic_data(n_portfolios=1, n_assets=2, n_days=2, start_date=self.d)
+        self.assertEqual(self.composite.members.count(), 2)
+
+
+class AttributionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portfolio = Portfolio.objects.create(name="P", initial_value=Decimal("1000"))
+        cls.dates = [date(2022, 1, 3), date(2022, 1, 4), date(2022, 1, 5)]
+        prices = {"A": (10, 12, 9), "B": (20, 19, 25), "C": (5, 5, 4)}
+        for ticker, series in prices.items():
+            asset = Asset.objects.create(ticker=ticker)
+            PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=asset, quantity=Decimal("2"))
+            AssetPrice.objects.bulk_create(
+                AssetPrice(asset=asset, date=d, price=Decimal(p))
+                for d, p in zip(cls.dates, series)
+            )
+
+    def _attribution(self, **kwargs):
+        return calculate_attribution(
+            portfolio_id=self.portfolio.id,
+            start_date=self.dates[0],
+            end_date=self.dates[-1],
+            **kwargs,
+        )
+
+    def test_contributions_add_up(self):
+        for granularity in GRANULARITIES:
+            for period in self._attribution(granularity=granularity):
+                contributions = period["contributions"]
+                self.assertAlmostEqual(
+                    sum(c["value_contribution"] for c in contributions),
+                    period["end_value"] - period["start_value"],
+                )
+                self.assertAlmostEqual(
+                    sum(c["return_contribution"] for c in contributions),
+                    period["total_return"],
+                )
+
+    def test_period(self):
+        [period] = self._attribution()
+        self.assertEqual(period["start_date"], self.dates[0])
+        self.assertEqual(period["end_date"], self.dates[-1])
+        self.assertEqual(period["start_value"], 70.0)
+        self.assertEqual(period["end_value"], 76.0)
+        self.assertEqual(
+            {c["ticker"]: c["value_contribution"] for c in period["contributions"]},
+            {"A": -2.0, "B": 10.0, "C": -2.0},
+        )
+
+    def test_daily_returns_consecutive_periods(self):
+        periods = self._attribution(granularity="daily")
+        self.assertEqual(len(periods), len(self.dates) - 1)
+        self.assertEqual(
+            [(p["start_date"], p["end_date"]) for p in periods],
+            list(zip(self.dates, self.dates[1:])),
+        )
+
+    def test_top_keeps_largest_absolute_contributions(self):
+        periods = self._attribution(granularity="daily", top=1)
+        # día 1: A +4, B -2, C 0; día 2: A -6, B +12, C -2
+        self.assertEqual(
+            [[c["ticker"] for c in p["contributions"]] for p in periods],
+            [["A"], ["B"]],
+        )
+        [period] = self._attribution(top=2)
+        self.assertEqual(period["contributions"][0]["ticker"], "B")
+        self.assertEqual(len(period["contributions"]), 2)
+
+    def test_single_date_is_404(self):
+        response = self.client.get(
+            f"/api/portfolios/{self.portfolio.id}/attribution/"
+            "?start_date=2022-01-03&end_date=2022-01-03"
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SnapshotEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.portfolio = Portfolio.objects.create(name="P", initial_value=Decimal("1000"))
+        a = Asset.objects.create(ticker="A")
+        cls.dates = [date(2022, 1, 3) + timedelta(days=i) for i in range(5)]
+        AssetPrice.objects.bulk_create(
+            AssetPrice(asset=a, date=d, price=Decimal(i + 1)) for i, d in enumerate(cls.dates)
+        )
+        PortfolioPosition.objects.create(portfolio=cls.portfolio, asset=a, quantity=Decimal("2"))
+
+    def test_snapshots_only_for_given_dates(self):
+        data = calculate_portfolio_snapshots(
+            portfolio_id=self.portfolio.id,
+            dates=[self.dates[4], self.dates[0]],
+        )
+        self.assertEqual(
+            [(item["date"], item["total_value"]) for item in data],
+            [(self.dates[0], Decimal("2")), (self.dates[4], Decimal("10"))],
+        )
+
+    def test_events_require_asgi(self):
+        for url in (
+            f"/api/portfolios/{self.portfolio.id}/events/",
+            f"/api/portfolios/events/?ids={self.portfolio.id}",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 501)
+                self.assertIn("ASGI", response.json()["detail"])
+
+
+class SnapshotBroadcasterTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(
+            PORTFOLIO_EVENTS_FILE=Path(tmp.name) / "events.json",
+            PORTFOLIO_EVENTS_POLL_SECONDS=0.05,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.calls = []
+        self.fail_next = False
+
+    def _render(self, portfolio_id, dates):
+        self.calls.append((portfolio_id, dates))
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("boom")
+        return [f"{portfolio_id}:{d.isoformat()}" for d in dates]
+
+    async def test_loads_fanned_out_once_per_portfolio(self):
+        broadcaster = SnapshotBroadcaster(render=self._render)
+        q1 = broadcaster.subscribe([1])
+        q2 = broadcaster.subscribe([1, 2])
+        try:
+            # dos cargas dentro del mismo intervalo de lectura
+            notify_data_loaded([date(2022, 1, 3)])
+            notify_data_loaded([date(2022, 1, 4)])
+
+            first = await asyncio.wait_for(q1.get(), timeout=2)
+            received = [await asyncio.wait_for(q2.get(), timeout=2) for _ in range(2)]
+        finally:
+            broadcaster.unsubscribe(q1, [1])
+            broadcaster.unsubscribe(q2, [1, 2])
+
+        expected_dates = [date(2022, 1, 3), date(2022, 1, 4)]
+        self.assertEqual(sorted(self.calls), [(1, expected_dates), (2, expected_dates)])
+        self.assertEqual(first, ["1:2022-01-03", "1:2022-01-04"])
+        self.assertIn(first, received)
+        self.assertIn(["2:2022-01-03", "2:2022-01-04"], received)
+
+    async def test_render_error_keeps_watching(self):
+        broadcaster = SnapshotBroadcaster(render=self._render)
+        queue = broadcaster.subscribe([1])
+        try:
+            self.fail_next = True
+            with self.assertLogs("portfolio.notifications", level="ERROR"):
+                notify_data_loaded([date(2022, 1, 3)])
+                while not self.calls:
+                    await asyncio.sleep(0.01)
+
+            notify_data_loaded([date(2022, 1, 4)])
+            messages = await asyncio.wait_for(queue.get(), timeout=2)
+        finally:
+            broadcaster.unsubscribe(queue, [1])
+
+        self.assertEqual(messages, ["1:2022-01-04"])
+
+    async def test_render_value_error_is_skipped_quietly(self):
+        def render(portfolio_id, dates):
+            if portfolio_id == 1:
+                raise ValueError("Portfolio 1 no tiene posiciones")
+            return self._render(portfolio_id, dates)
+
+        broadcaster = SnapshotBroadcaster(render=render)
+        queue = broadcaster.subscribe([1, 2])
+        try:
+            with self.assertNoLogs("portfolio.notifications", level="ERROR"):
+                notify_data_loaded([date(2022, 1, 3)])
+                messages = await asyncio.wait_for(queue.get(), timeout=2)
+        finally:
+            broadcaster.unsubscribe(queue, [1, 2])
+
+        self.assertEqual(messages, ["2:2022-01-03"])
+
+    async def test_unsubscribe_cancels_watcher(self):
+        broadcaster = SnapshotBroadcaster(render=self._render)
+        q1 = broadcaster.subscribe([1])
+        q2 = broadcaster.subscribe([2])
+        task = broadcaster._task
+
+        broadcaster.unsubscribe(q1, [1])
+        self.assertFalse(task.done())
+
+        broadcaster.unsubscribe(q2, [2])
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertIsNone(broadcaster._task)
+
+
+class ProcessAssetsPricesTests(TestCase):
+    def test_returns_only_dates_with_new_prices(self):
+        prices_df = pd.DataFrame(
+            {"fecha": pd.to_datetime(["2022-01-03", "2022-01-04"]), "A": [1.0, 2.0]}
+        )
+        assets_map, new_dates = _process_assets_prices(prices_df)
+        self.assertEqual(set(assets_map), {"A"})
+        self.assertEqual(new_dates, {date(2022, 1, 3), date(2022, 1, 4)})
+
+        prices_df.loc[2] = [pd.Timestamp("2022-01-05"), 3.0]
+        _, new_dates = _process_assets_prices(prices_df)
+        self.assertEqual(new_dates, {date(2022, 1, 5)})